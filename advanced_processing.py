@@ -11,36 +11,216 @@ https://github.com/yourusername/ESP32-CAM-Stream-Vision
 
 import cv2
 import numpy as np
+import os
 import time
 import argparse
 import sys
 import signal
-from collections import deque
+import threading
+import queue
+
+def create_video_writer(path, fps, size):
+    """
+    Create a VideoWriter, preferring a hardware-accelerated H.264
+    encoder through FFmpeg; falls back to the software mp4v encoder
+    when no acceleration is available.
+    """
+    try:
+        out = cv2.VideoWriter(
+            path, cv2.CAP_FFMPEG, cv2.VideoWriter_fourcc(*'H264'), fps, size,
+            params=[cv2.VIDEOWRITER_PROP_HW_ACCELERATION, cv2.VIDEO_ACCELERATION_ANY])
+        if out.isOpened():
+            return out
+    except cv2.error:
+        pass
+    return cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'mp4v'), fps, size)
+
+class AsyncVideoWriter(threading.Thread):
+    """Write frames on a background thread so encoding never blocks the main loop.
+
+    Frames are pushed through a bounded queue; if the encoder cannot
+    keep up, new frames are dropped rather than stalling capture and
+    processing.
+    """
+
+    def __init__(self, writer, queue_size=8):
+        super().__init__(daemon=True)
+        self.writer = writer
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.start()
+
+    def run(self):
+        while True:
+            frame = self.queue.get()
+            if frame is None:
+                break
+            self.writer.write(frame)
+
+    def write(self, frame):
+        """Queue a frame for encoding (copied, since callers reuse buffers)"""
+        try:
+            self.queue.put_nowait(frame.copy())
+        except queue.Full:
+            pass
+
+    def release(self):
+        """Flush queued frames and release the underlying writer"""
+        self.queue.put(None)
+        self.join(timeout=5)
+        self.writer.release()
+
+
+class FrameGrabber(threading.Thread):
+    """Background thread that keeps the most recent stream frame available.
+
+    Reading the MJPEG stream blocks on network I/O; doing it on its own
+    thread overlaps that wait with frame processing in the main loop.
+    Only the latest frame is kept, so the consumer never falls behind.
+    """
+
+    def __init__(self, cap, url):
+        super().__init__(daemon=True)
+        self.cap = cap
+        self.url = url
+        self.latest = None
+        self.lock = threading.Lock()
+        self.running = True
+
+    def run(self):
+        while self.running:
+            ret, frame = self.cap.read()
+
+            if not ret:
+                print("Error: Could not read frame. Attempting to reconnect...")
+                time.sleep(1)
+                self.cap.release()
+                self.cap = cv2.VideoCapture(self.url)
+                continue
+
+            with self.lock:
+                self.latest = frame
+
+    def read(self):
+        """Return a copy of the most recent frame, or None if none arrived yet.
+
+        Only the reference grab happens under the lock; the frame copy
+        runs after release (numpy drops the GIL for the memcpy), so the
+        grabber is never blocked for the duration of a full-frame copy.
+        The grabbed reference is safe to copy outside the lock because
+        cap.read() produces a fresh buffer each iteration and the old
+        one is never written again.
+        """
+        with self.lock:
+            latest = self.latest
+        return latest.copy() if latest is not None else None
+
+    def stop(self):
+        """Stop the thread and release the capture"""
+        self.running = False
+        self.join(timeout=2)
+        self.cap.release()
+
 
 class MotionDetector:
     """Class for detecting motion in video stream"""
     
-    def __init__(self, history=20, threshold=25, detect_shadows=True, min_area=500):
+    def __init__(self, history=20, threshold=25, detect_shadows=True, min_area=500,
+                 use_cuda=False, algo='CNT'):
         """Initialize motion detector"""
-        self.bg_subtractor = cv2.createBackgroundSubtractorMOG2(
-            history=history,
-            varThreshold=threshold,
-            detectShadows=detect_shadows
-        )
         self.min_area = min_area
         self.motion_detected = False
         self.motion_timestamp = 0
         self.motion_duration = 0
-        
+
+        # Precomputed morphology kernel (avoids a per-frame allocation)
+        self._kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (3, 3))
+
+        # Use the CUDA background subtractor and morphology when requested
+        # and a device is actually available; otherwise fall back to CPU
+        self.use_cuda = (use_cuda and hasattr(cv2, 'cuda')
+                         and cv2.cuda.getCudaEnabledDeviceCount() > 0)
+
+        # CNT keeps a few counters per pixel instead of a mixture of
+        # Gaussians, so it is much lighter on memory bandwidth; it ships
+        # in opencv-contrib, so fall back to MOG2 when bgsegm is missing
+        if algo == 'CNT' and not hasattr(cv2, 'bgsegm'):
+            algo = 'MOG2'
+        self.algo = algo
+
+        if self.use_cuda:
+            # The CUDA path always uses MOG2 (no CUDA CNT/KNN kernels)
+            self.bg_subtractor = cv2.cuda.createBackgroundSubtractorMOG2(
+                history=history,
+                varThreshold=threshold,
+                detectShadows=detect_shadows
+            )
+            self._morph = cv2.cuda.createMorphologyFilter(
+                cv2.MORPH_OPEN, cv2.CV_8UC1, self._kernel)
+            self._stream = cv2.cuda_Stream()
+            self._gpu_frame = cv2.cuda_GpuMat()
+        elif self.algo == 'CNT':
+            self.bg_subtractor = cv2.bgsegm.createBackgroundSubtractorCNT(
+                minPixelStability=15,
+                useHistory=True,
+                maxPixelStability=15 * 60,
+                isParallel=True
+            )
+        elif self.algo == 'KNN':
+            self.bg_subtractor = cv2.createBackgroundSubtractorKNN(
+                history=history,
+                dist2Threshold=threshold,
+                detectShadows=detect_shadows
+            )
+        else:
+            self.bg_subtractor = cv2.createBackgroundSubtractorMOG2(
+                history=history,
+                varThreshold=threshold,
+                detectShadows=detect_shadows
+            )
+
+        # Background model runs at half resolution; contour coordinates
+        # are scaled back up when drawing on the full-size frame
+        self._scale = 2
+        self._min_area_scaled = min_area / (self._scale * self._scale)
+
+        # Only let the background model learn on every Nth frame; the
+        # other frames do a pure foreground estimate (learningRate=0)
+        self._frame_idx = 0
+        self._update_every = 5
+
+        # Reusable output buffer; drawing happens here instead of on a
+        # fresh copy of the input every frame
+        self._scratch = None
+
     def detect(self, frame):
         """Detect motion in the frame"""
-        # Apply background subtraction
-        fg_mask = self.bg_subtractor.apply(frame)
-        
-        # Remove noise
-        kernel = np.ones((5, 5), np.uint8)
-        fg_mask = cv2.morphologyEx(fg_mask, cv2.MORPH_OPEN, kernel)
-        fg_mask = cv2.morphologyEx(fg_mask, cv2.MORPH_CLOSE, kernel)
+        # Copy the frame into the reusable scratch buffer for drawing
+        if self._scratch is None or self._scratch.shape != frame.shape:
+            self._scratch = np.empty_like(frame)
+        np.copyto(self._scratch, frame)
+        # Apply background subtraction at reduced resolution to cut the
+        # per-pixel Gaussian model traffic
+        small = cv2.resize(frame, None, fx=1.0 / self._scale, fy=1.0 / self._scale,
+                           interpolation=cv2.INTER_AREA)
+        lr = -1 if (self._frame_idx % self._update_every) == 0 else 0
+        self._frame_idx += 1
+
+        if self.use_cuda:
+            # Upload once, subtract and clean up on the device, download
+            # only the final mask
+            self._gpu_frame.upload(small, self._stream)
+            gpu_mask = self.bg_subtractor.apply(self._gpu_frame, lr, self._stream)
+            gpu_mask = self._morph.apply(gpu_mask, stream=self._stream)
+            fg_mask = gpu_mask.download(self._stream)
+            self._stream.waitForCompletion()
+        else:
+            fg_mask = self.bg_subtractor.apply(small, learningRate=lr)
+
+            # Remove noise: erode to drop speckles, then dilate twice to
+            # reconnect blobs (same as open+dilate, via the SIMD-vectorized
+            # primitives directly); dst= reuses the mask buffer in place
+            cv2.erode(fg_mask, self._kernel, dst=fg_mask)
+            cv2.dilate(fg_mask, self._kernel, dst=fg_mask, iterations=2)
         
         # Find contours in the mask
         contours, _ = cv2.findContours(fg_mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
@@ -48,16 +228,17 @@ class MotionDetector:
         # Initialize motion flag
         motion_in_current_frame = False
         
-        # Process each contour
+        # Process each contour (areas and boxes are in half-res coordinates)
         for contour in contours:
-            if cv2.contourArea(contour) < self.min_area:
+            if cv2.contourArea(contour) < self._min_area_scaled:
                 continue
-                
-            # Get bounding box
+
+            # Get bounding box and scale back to full resolution
             x, y, w, h = cv2.boundingRect(contour)
-            
+            x, y, w, h = (v * self._scale for v in (x, y, w, h))
+
             # Draw rectangle around the motion
-            cv2.rectangle(frame, (x, y), (x + w, y + h), (0, 255, 0), 2)
+            cv2.rectangle(self._scratch, (x, y), (x + w, y + h), (0, 255, 0), 2)
             
             # Set motion flag
             motion_in_current_frame = True
@@ -80,14 +261,14 @@ class MotionDetector:
         
         # Add motion status text to frame
         status_text = "Motion Detected" if self.motion_detected else "No Motion"
-        cv2.putText(frame, status_text, (10, 30), 
+        cv2.putText(self._scratch, status_text, (10, 30),
                    cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 255) if self.motion_detected else (0, 255, 0), 2)
-        
+
         if self.motion_detected:
-            cv2.putText(frame, f"Duration: {self.motion_duration:.1f}s", (10, 70), 
+            cv2.putText(self._scratch, f"Duration: {self.motion_duration:.1f}s", (10, 70),
                        cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 255), 2)
-        
-        return frame, self.motion_detected, fg_mask
+
+        return self._scratch, self.motion_detected, fg_mask
 
 
 class ObjectTracker:
@@ -100,8 +281,22 @@ class ObjectTracker:
         self.tracking = False
         self.bbox = None
         self.trail_length = trail_length
-        self.center_points = deque(maxlen=trail_length)
-        
+
+        # Center points live in a preallocated ring buffer instead of a
+        # deque of Python tuples; appends overwrite the oldest slot
+        self._trail = np.zeros((trail_length, 2), np.int32)
+        self._trail_head = 0
+        self._trail_count = 0
+
+        # Trail gradient colors precomputed per bucket; the trail is
+        # rendered as a few polylines calls instead of one cv2.line
+        # per segment
+        self._trail_buckets = 8
+        self._bucket_colors = []
+        for i in range(self._trail_buckets):
+            intensity = int(255 * (i + 0.5) / self._trail_buckets)
+            self._bucket_colors.append((0, intensity, 255 - intensity))
+
         # Available tracker types
         self.tracker_types = {
             "BOOSTING": cv2.legacy.TrackerBoosting_create,
@@ -113,6 +308,23 @@ class ObjectTracker:
             "CSRT": cv2.legacy.TrackerCSRT_create
         }
     
+    def _append_point(self, center_x, center_y):
+        """Push a center point into the trail ring buffer"""
+        self._trail[self._trail_head] = (center_x, center_y)
+        self._trail_head = (self._trail_head + 1) % self.trail_length
+        self._trail_count = min(self._trail_count + 1, self.trail_length)
+
+    def _trail_points(self):
+        """Return the trail points oldest-first as a contiguous array"""
+        if self._trail_count < self.trail_length:
+            return self._trail[:self._trail_count]
+        return np.roll(self._trail, -self._trail_head, axis=0)
+
+    def _clear_trail(self):
+        """Empty the trail ring buffer"""
+        self._trail_head = 0
+        self._trail_count = 0
+
     def create_tracker(self):
         """Create a new tracker instance"""
         if self.tracker_type in self.tracker_types:
@@ -128,10 +340,10 @@ class ObjectTracker:
         success = self.tracker.init(frame, bbox)
         if success:
             self.tracking = True
-            self.center_points.clear()
+            self._clear_trail()
             center_x = int(bbox[0] + bbox[2] / 2)
             center_y = int(bbox[1] + bbox[3] / 2)
-            self.center_points.append((center_x, center_y))
+            self._append_point(center_x, center_y)
         return success
     
     def update(self, frame):
@@ -149,24 +361,26 @@ class ObjectTracker:
             # Calculate center point
             center_x = int(bbox[0] + bbox[2] / 2)
             center_y = int(bbox[1] + bbox[3] / 2)
-            self.center_points.append((center_x, center_y))
+            self._append_point(center_x, center_y)
             
             # Draw bounding box
             p1 = (int(bbox[0]), int(bbox[1]))
             p2 = (int(bbox[0] + bbox[2]), int(bbox[1] + bbox[3]))
             cv2.rectangle(frame, p1, p2, (0, 255, 0), 2, 1)
             
-            # Draw trail
-            for i in range(1, len(self.center_points)):
-                if self.center_points[i - 1] is None or self.center_points[i] is None:
-                    continue
-                    
-                # Calculate color gradient based on position in the trail
-                color_intensity = int(255 * (i / len(self.center_points)))
-                color = (0, color_intensity, 255 - color_intensity)
-                
-                # Draw line segment
-                cv2.line(frame, self.center_points[i - 1], self.center_points[i], color, 2)
+            # Draw trail: unroll the ring buffer once and render the
+            # gradient as a handful of grouped polylines (one per color
+            # bucket) instead of a Python cv2.line call per segment
+            pts = self._trail_points()
+            n = len(pts)
+            if n >= 2:
+                buckets = min(self._trail_buckets, n - 1)
+                for b in range(buckets):
+                    lo = (n - 1) * b // buckets
+                    hi = (n - 1) * (b + 1) // buckets
+                    seg = pts[lo:hi + 1].reshape(-1, 1, 2)
+                    color = self._bucket_colors[b * self._trail_buckets // buckets]
+                    cv2.polylines(frame, [seg], False, color, 2)
             
             # Display tracking status
             cv2.putText(frame, "Tracking", (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2)
@@ -181,7 +395,7 @@ class ObjectTracker:
         """Stop tracking"""
         self.tracking = False
         self.bbox = None
-        self.center_points.clear()
+        self._clear_trail()
 
 
 class ColorFilter:
@@ -201,7 +415,35 @@ class ColorFilter:
             "purple": [(np.array([140, 40, 40]), np.array([170, 255, 255]))],
             "orange": [(np.array([10, 100, 100]), np.array([25, 255, 255]))]
         }
-        
+
+        # Precomputed morphology kernel (avoids a per-frame allocation)
+        self._kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (3, 3))
+
+        # Reusable output buffer; drawing happens here instead of on a
+        # fresh copy of the input every frame
+        self._scratch = None
+
+        # Reusable HSV conversion and mask buffers, written through dst=
+        # so the allocator stays out of the per-frame path
+        self._hsv = None
+        self._h = None
+        self._mask = None
+        self._sv_mask = None
+
+        # Per-color hue lookup tables: 255 inside the hue interval(s),
+        # 0 outside. The LUT handles multi-interval colors like red in a
+        # single pass, replacing one inRange call per interval plus the
+        # mask OR. Saturation/value floors are gated separately.
+        self._h_lut = {}
+        self._sv_floor = {}
+        for name, ranges in self.color_ranges.items():
+            lut = np.zeros(256, np.uint8)
+            for lower, upper in ranges:
+                lut[lower[0]:upper[0] + 1] = 255
+            self._h_lut[name] = lut
+            self._sv_floor[name] = (int(min(lo[1] for lo, _ in ranges)),
+                                    int(min(lo[2] for lo, _ in ranges)))
+
     def set_color(self, color_name):
         """Set the color to filter"""
         if color_name in self.color_ranges:
@@ -211,41 +453,51 @@ class ColorFilter:
     
     def filter(self, frame):
         """Apply color filtering to the frame"""
+        # Size the reusable conversion/mask buffers on first use
+        if self._hsv is None or self._hsv.shape != frame.shape:
+            self._hsv = np.empty_like(frame)
+            self._h = np.empty(frame.shape[:2], np.uint8)
+            self._mask = np.empty(frame.shape[:2], np.uint8)
+            self._sv_mask = np.empty(frame.shape[:2], np.uint8)
+
         # Convert to HSV color space
-        hsv = cv2.cvtColor(frame, cv2.COLOR_BGR2HSV)
-        
-        # Create mask for the selected color
-        mask = None
-        
-        if self.color_name in self.color_ranges:
-            # Apply each range for the selected color
-            for lower, upper in self.color_ranges[self.color_name]:
-                if mask is None:
-                    mask = cv2.inRange(hsv, lower, upper)
-                else:
-                    mask = mask | cv2.inRange(hsv, lower, upper)
+        cv2.cvtColor(frame, cv2.COLOR_BGR2HSV, dst=self._hsv)
+
+        # Create mask for the selected color: classify hue through the
+        # precomputed LUT, then gate on the saturation/value floors
+        cv2.extractChannel(self._hsv, 0, dst=self._h)
+        cv2.LUT(self._h, self._h_lut[self.color_name], dst=self._mask)
+        mask = self._mask
+        s_lo, v_lo = self._sv_floor[self.color_name]
+        cv2.inRange(self._hsv, (0, s_lo, v_lo), (255, 255, 255), dst=self._sv_mask)
+        cv2.bitwise_and(mask, self._sv_mask, dst=mask)
         
-        # Apply morphological operations to clean up the mask
-        kernel = np.ones((5, 5), np.uint8)
-        mask = cv2.morphologyEx(mask, cv2.MORPH_OPEN, kernel)
-        mask = cv2.morphologyEx(mask, cv2.MORPH_CLOSE, kernel)
+        # Clean up the mask: erode to drop speckles, then dilate twice to
+        # reconnect blobs (same as open+dilate, via the SIMD-vectorized
+        # primitives directly); dst= reuses the mask buffer in place
+        cv2.erode(mask, self._kernel, dst=mask)
+        cv2.dilate(mask, self._kernel, dst=mask, iterations=2)
         
         # Find contours
         contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
         
-        # Find the largest contour
+        # Find the largest contour: batch the areas into one array and
+        # argmax in C instead of comparing in a Python loop
         largest_contour = None
-        max_area = 0
-        
-        for contour in contours:
-            area = cv2.contourArea(contour)
-            if area > 500 and area > max_area:
-                max_area = area
-                largest_contour = contour
-        
-        # Draw contours on original frame
-        result = frame.copy()
+
+        if contours:
+            areas = np.fromiter((cv2.contourArea(c) for c in contours),
+                                dtype=np.float32, count=len(contours))
+            idx = np.argmax(areas)
+            if areas[idx] > 500:
+                largest_contour = contours[idx]
         
+        # Draw contours on a reusable copy of the original frame
+        if self._scratch is None or self._scratch.shape != frame.shape:
+            self._scratch = np.empty_like(frame)
+        np.copyto(self._scratch, frame)
+        result = self._scratch
+
         if largest_contour is not None:
             cv2.drawContours(result, [largest_contour], -1, (0, 255, 0), 2)
             
@@ -276,7 +528,14 @@ def main():
     
     # Register signal handler for Ctrl+C
     signal.signal(signal.SIGINT, lambda sig, frame: sys.exit(0))
-    
+
+    # Use OpenCV's optimized (SIMD) code paths and its internal thread
+    # pool so per-frame filters run across all cores
+    cv2.setUseOptimized(True)
+    cv2.setNumThreads(max(2, os.cpu_count() or 1))
+    if cv2.ocl.haveOpenCL():
+        cv2.ocl.setUseOpenCL(True)
+
     # Create argument parser
     parser = argparse.ArgumentParser(description='Advanced processing for ESP32-CAM stream')
     parser.add_argument('--ip', type=str, default='192.168.4.1', 
@@ -294,13 +553,20 @@ def main():
     parser.add_argument('--tracker', type=str, default='KCF',
                         choices=['BOOSTING', 'MIL', 'KCF', 'TLD', 'MEDIANFLOW', 'MOSSE', 'CSRT'],
                         help='Tracker type to use in tracking mode (default: KCF)')
+    parser.add_argument('--bgsub', type=str, default='CNT',
+                        choices=['MOG2', 'KNN', 'CNT'],
+                        help='Background subtractor for motion mode (default: CNT, falls back to MOG2 without opencv-contrib)')
+    parser.add_argument('--gpu', action='store_true',
+                        help='Use CUDA background subtraction in motion mode (falls back to CPU if unavailable)')
     parser.add_argument('--save', action='store_true',
                         help='Save processed video to file')
     parser.add_argument('--output', type=str, default='esp32_advanced_output.mp4',
                         help='Output video filename (default: esp32_advanced_output.mp4)')
     parser.add_argument('--resize', type=int, default=0,
                         help='Resize output window to this width (keeps aspect ratio, 0 for no resize)')
-    
+    parser.add_argument('--headless', action='store_true',
+                        help='Run without any GUI windows (useful with --save; exit with Ctrl+C)')
+
     args = parser.parse_args()
     
     # Construct the URL for the stream
@@ -322,13 +588,17 @@ def main():
     # Initialize video writer
     out = None
     if args.save:
-        fourcc = cv2.VideoWriter_fourcc(*'mp4v')
-        out = cv2.VideoWriter(args.output, fourcc, 10.0, (frame_width, frame_height))
+        # Encode on a background thread so write() never blocks the loop
+        out = AsyncVideoWriter(create_video_writer(args.output, 10.0, (frame_width, frame_height)))
         print(f"Saving output to: {args.output}")
     
     # Initialize processing objects based on mode
     if args.mode == 'motion':
-        processor = MotionDetector(min_area=500)
+        processor = MotionDetector(min_area=500, use_cuda=args.gpu, algo=args.bgsub)
+        if args.gpu and not processor.use_cuda:
+            print("Warning: CUDA not available, using CPU background subtraction")
+        if args.bgsub == 'CNT' and processor.algo != 'CNT':
+            print("Warning: CNT requires opencv-contrib, using MOG2")
         window_name = 'ESP32-CAM Motion Detection'
     elif args.mode == 'tracking':
         processor = ObjectTracker(tracker_type=args.tracker)
@@ -337,120 +607,143 @@ def main():
         processor = ColorFilter(color_name=args.color)
         window_name = f'ESP32-CAM Color Filter ({args.color})'
     
-    # Create windows
-    cv2.namedWindow(window_name, cv2.WINDOW_NORMAL)
-    
-    # Secondary windows for different modes
-    if args.mode == 'motion':
-        cv2.namedWindow('Motion Mask', cv2.WINDOW_NORMAL)
-    elif args.mode == 'color':
-        cv2.namedWindow('Color Filtered', cv2.WINDOW_NORMAL)
-        cv2.namedWindow('Color Mask', cv2.WINDOW_NORMAL)
-    
-    # Set window sizes
-    if args.resize > 0:
-        aspect_ratio = frame_width / frame_height
-        resize_height = int(args.resize / aspect_ratio)
-        cv2.resizeWindow(window_name, args.resize, resize_height)
-        
+    # Create windows (skipped entirely in headless mode, which also
+    # avoids the per-frame GUI event round-trips)
+    if not args.headless:
+        cv2.namedWindow(window_name, cv2.WINDOW_NORMAL)
+
+        # Secondary windows for different modes
         if args.mode == 'motion':
-            cv2.resizeWindow('Motion Mask', args.resize, resize_height)
+            cv2.namedWindow('Motion Mask', cv2.WINDOW_NORMAL)
         elif args.mode == 'color':
-            cv2.resizeWindow('Color Filtered', args.resize, resize_height)
-            cv2.resizeWindow('Color Mask', args.resize, resize_height)
+            cv2.namedWindow('Color Filtered', cv2.WINDOW_NORMAL)
+            cv2.namedWindow('Color Mask', cv2.WINDOW_NORMAL)
+
+        # Set window sizes
+        if args.resize > 0:
+            aspect_ratio = frame_width / frame_height
+            resize_height = int(args.resize / aspect_ratio)
+            cv2.resizeWindow(window_name, args.resize, resize_height)
+
+            if args.mode == 'motion':
+                cv2.resizeWindow('Motion Mask', args.resize, resize_height)
+            elif args.mode == 'color':
+                cv2.resizeWindow('Color Filtered', args.resize, resize_height)
+                cv2.resizeWindow('Color Mask', args.resize, resize_height)
+        else:
+            cv2.resizeWindow(window_name, 640, int(640 * frame_height / frame_width))
+
+            if args.mode == 'motion':
+                cv2.resizeWindow('Motion Mask', 320, int(320 * frame_height / frame_width))
+            elif args.mode == 'color':
+                cv2.resizeWindow('Color Filtered', 320, int(320 * frame_height / frame_width))
+                cv2.resizeWindow('Color Mask', 320, int(320 * frame_height / frame_width))
+
+    if args.headless:
+        print(f"Stream started in {args.mode} mode (headless). Press Ctrl+C to exit.")
     else:
-        cv2.resizeWindow(window_name, 640, int(640 * frame_height / frame_width))
-        
-        if args.mode == 'motion':
-            cv2.resizeWindow('Motion Mask', 320, int(320 * frame_height / frame_width))
+        print(f"Stream started in {args.mode} mode. Controls:")
+
+        if args.mode == 'tracking':
+            print("  - Press 's' to select an object to track")
+            print("  - Press 'r' to reset tracking")
         elif args.mode == 'color':
-            cv2.resizeWindow('Color Filtered', 320, int(320 * frame_height / frame_width))
-            cv2.resizeWindow('Color Mask', 320, int(320 * frame_height / frame_width))
-    
-    print(f"Stream started in {args.mode} mode. Controls:")
-    
-    if args.mode == 'tracking':
-        print("  - Press 's' to select an object to track")
-        print("  - Press 'r' to reset tracking")
-    elif args.mode == 'color':
-        print("  - Press keys 1-6 to change color:")
-        print("    1: Red, 2: Green, 3: Blue, 4: Yellow, 5: Purple, 6: Orange")
-    
-    print("  - Press 'q' to exit")
+            print("  - Press keys 1-6 to change color:")
+            print("    1: Red, 2: Green, 3: Blue, 4: Yellow, 5: Purple, 6: Orange")
+
+        print("  - Press 'q' to exit")
     
     # Variables for tracking mode
     tracking_object = False
     selection_in_progress = False
     selection_roi = None
     
-    # Track FPS
-    fps_start_time = time.time()
+    # Track FPS (timer sampled only every 10 frames; the overlay
+    # string is cached so it is not re-formatted per frame)
+    fps_start_time = time.perf_counter()
     fps_frame_count = 0
-    fps = 0
-    
+    fps_text = "FPS: 0.0"
+
+    # Read the stream on a separate thread so network I/O overlaps
+    # with processing and display
+    grabber = FrameGrabber(cap, url)
+    grabber.start()
+
+    frame_idx = 0
+
     try:
         while True:
-            # Read frame from the video stream
-            ret, frame = cap.read()
-            
-            if not ret:
-                print("Error: Could not read frame. Attempting to reconnect...")
-                time.sleep(1)
-                cap.release()
-                cap = cv2.VideoCapture(url)
+            # Grab the most recent frame from the reader thread
+            frame = grabber.read()
+
+            if frame is None:
+                # No frame yet; wait briefly for the grabber
+                time.sleep(0.005)
                 continue
-            
-            # Make a copy of the frame for processing
-            display_frame = frame.copy()
-            
+
             # Calculate FPS
             fps_frame_count += 1
             if fps_frame_count >= 10:
-                end_time = time.time()
-                fps = fps_frame_count / (end_time - fps_start_time)
-                fps_start_time = time.time()
+                now = time.perf_counter()
+                fps_text = f"FPS: {fps_frame_count / (now - fps_start_time):.1f}"
+                fps_start_time = now
                 fps_frame_count = 0
             
-            # Process frame based on selected mode
+            # Process frame based on selected mode. The grabber hands out
+            # a private copy per iteration and the motion/color
+            # processors draw into their own scratch buffers, so no
+            # defensive copy is needed here; the tracker draws directly
+            # on this iteration's frame.
             if args.mode == 'motion':
-                processed_frame, motion_detected, motion_mask = processor.detect(display_frame)
-                
+                processed_frame, motion_detected, motion_mask = processor.detect(frame)
+
                 # Show the motion mask
-                cv2.imshow('Motion Mask', motion_mask)
-                
+                if not args.headless:
+                    cv2.imshow('Motion Mask', motion_mask)
+
             elif args.mode == 'tracking':
                 if tracking_object:
-                    processed_frame, success, bbox = processor.update(display_frame)
+                    processed_frame, success, bbox = processor.update(frame)
                     if not success:
                         tracking_object = False
                 else:
-                    processed_frame = display_frame
+                    processed_frame = frame
                     if selection_in_progress and selection_roi:
                         # Draw selected region
                         x, y, w, h = selection_roi
                         cv2.rectangle(processed_frame, (x, y), (x + w, y + h), (255, 0, 0), 2)
                 
             elif args.mode == 'color':
-                processed_frame, filtered_frame, color_mask = processor.filter(display_frame)
-                
+                processed_frame, filtered_frame, color_mask = processor.filter(frame)
+
                 # Show the filtered image and mask
-                cv2.imshow('Color Filtered', filtered_frame)
-                cv2.imshow('Color Mask', color_mask)
+                if not args.headless:
+                    cv2.imshow('Color Filtered', filtered_frame)
+                    cv2.imshow('Color Mask', color_mask)
             
             # Add FPS to the frame
-            cv2.putText(processed_frame, f"FPS: {fps:.1f}", (10, frame_height - 30),
+            cv2.putText(processed_frame, fps_text, (10, frame_height - 30),
                         cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
             
             # Save frame if requested
             if args.save and out is not None:
                 out.write(processed_frame)
             
+            frame_idx += 1
+
+            if args.headless:
+                continue
+
             # Display the processed frame
             cv2.imshow(window_name, processed_frame)
-            
-            # Handle keyboard input
-            key = cv2.waitKey(1) & 0xFF
-            
+
+            # Handle keyboard input. A full waitKey(1) sleeps ~1 ms, so
+            # it only runs every 3rd frame; pollKey returns immediately
+            if (frame_idx % 3) == 0 or not hasattr(cv2, 'pollKey'):
+                key = cv2.waitKey(1) & 0xFF
+            else:
+                key = cv2.pollKey() & 0xFF
+
             if key == ord('q'):
                 # Exit
                 break
@@ -491,7 +784,7 @@ def main():
         print(f"Error: {e}")
     finally:
         # Release resources
-        cap.release()
+        grabber.stop()
         if out is not None:
             out.release()
         cv2.destroyAllWindows()
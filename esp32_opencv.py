@@ -11,16 +11,220 @@ https://github.com/yourusername/ESP32-CAM-Stream-Vision
 
 import cv2
 import numpy as np
+import os
 import time
 import argparse
 import sys
 import signal
+import threading
+import queue
+
+# Numba is optional; when present the grayscale+blur stage runs as a
+# single fused parallel kernel instead of two full-frame OpenCV passes
+try:
+    from numba import njit, prange
+    HAS_NUMBA = True
+except ImportError:
+    HAS_NUMBA = False
+
+if HAS_NUMBA:
+    @njit(parallel=True, fastmath=True, cache=True)
+    def _bgr_to_blurred_gray_numba(bgr, out):
+        """Fused BGR->gray conversion and 3x3 binomial blur, one pass"""
+        h = bgr.shape[0]
+        w = bgr.shape[1]
+        for y in prange(h):
+            ym = y - 1 if y > 0 else 0
+            yp = y + 1 if y < h - 1 else h - 1
+            for x in range(w):
+                xm = x - 1 if x > 0 else 0
+                xp = x + 1 if x < w - 1 else w - 1
+                acc = 0.0
+                for i in range(3):
+                    yy = ym if i == 0 else (y if i == 1 else yp)
+                    wy = 2.0 if i == 1 else 1.0
+                    for j in range(3):
+                        xx = xm if j == 0 else (x if j == 1 else xp)
+                        wx = 2.0 if j == 1 else 1.0
+                        gray = (0.114 * bgr[yy, xx, 0]
+                                + 0.587 * bgr[yy, xx, 1]
+                                + 0.299 * bgr[yy, xx, 2])
+                        acc += wy * wx * gray
+                out[y, x] = np.uint8(acc * 0.0625)
+
+    @njit(parallel=True, fastmath=True, cache=True)
+    def _adaptive_threshold_numba(gray, out, block, C):
+        """Fused box-mean adaptive threshold in two sliding-sum passes.
+
+        Each pixel costs O(1) instead of O(block^2): a vertical sliding
+        sum per column, then a horizontal sliding sum per row with the
+        threshold compare fused into the same loop. Windows are clamped
+        at the borders and divided by their true pixel count.
+        """
+        h, w = gray.shape
+        r = block // 2
+        vert = np.empty((h, w), np.float32)
+
+        for x in prange(w):
+            s = np.float32(0.0)
+            for y in range(min(r + 1, h)):
+                s += gray[y, x]
+            vert[0, x] = s
+            for y in range(1, h):
+                if y + r < h:
+                    s += gray[y + r, x]
+                if y - r - 1 >= 0:
+                    s -= gray[y - r - 1, x]
+                vert[y, x] = s
+
+        for y in prange(h):
+            cnt_y = min(y + r, h - 1) - max(y - r, 0) + 1
+            s = np.float32(0.0)
+            for x in range(min(r + 1, w)):
+                s += vert[y, x]
+            for x in range(w):
+                if x > 0:
+                    if x + r < w:
+                        s += vert[y, x + r]
+                    if x - r - 1 >= 0:
+                        s -= vert[y, x - r - 1]
+                cnt_x = min(x + r, w - 1) - max(x - r, 0) + 1
+                mean = s / (cnt_y * cnt_x)
+                out[y, x] = 255 if gray[y, x] > mean - C else 0
+
+# Reusable buffer for the blurred grayscale image
+_blur_buf = None
+
+# Reusable buffers for the contour image and the combined side-by-side view
+_contour_buf = None
+_combined_buf = None
+
+# Reusable buffer for the adaptive threshold output
+_thresh_buf = None
+
+def blurred_gray(frame):
+    """
+    Convert the frame to blurred grayscale for edge detection.
+
+    With Numba available this is one fused pass over the frame into a
+    reusable buffer; otherwise it falls back to the OpenCV
+    cvtColor + GaussianBlur pair.
+    """
+    global _blur_buf
+    if HAS_NUMBA:
+        if _blur_buf is None or _blur_buf.shape != frame.shape[:2]:
+            _blur_buf = np.empty(frame.shape[:2], np.uint8)
+        _bgr_to_blurred_gray_numba(frame, _blur_buf)
+        return _blur_buf
+
+    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    return cv2.GaussianBlur(gray, (5, 5), 0)
 
 def signal_handler(sig, frame):
     """Handle Ctrl+C gracefully"""
     print('\nStream viewing interrupted by user')
     sys.exit(0)
 
+def create_video_writer(path, fps, size):
+    """
+    Create a VideoWriter, preferring a hardware-accelerated H.264
+    encoder through FFmpeg; falls back to the software mp4v encoder
+    when no acceleration is available.
+    """
+    try:
+        out = cv2.VideoWriter(
+            path, cv2.CAP_FFMPEG, cv2.VideoWriter_fourcc(*'H264'), fps, size,
+            params=[cv2.VIDEOWRITER_PROP_HW_ACCELERATION, cv2.VIDEO_ACCELERATION_ANY])
+        if out.isOpened():
+            return out
+    except cv2.error:
+        pass
+    return cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'mp4v'), fps, size)
+
+class AsyncVideoWriter(threading.Thread):
+    """Write frames on a background thread so encoding never blocks the main loop.
+
+    Frames are pushed through a bounded queue; if the encoder cannot
+    keep up, new frames are dropped rather than stalling capture and
+    processing.
+    """
+
+    def __init__(self, writer, queue_size=8):
+        super().__init__(daemon=True)
+        self.writer = writer
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.start()
+
+    def run(self):
+        while True:
+            frame = self.queue.get()
+            if frame is None:
+                break
+            self.writer.write(frame)
+
+    def write(self, frame):
+        """Queue a frame for encoding (copied, since callers reuse buffers)"""
+        try:
+            self.queue.put_nowait(frame.copy())
+        except queue.Full:
+            pass
+
+    def release(self):
+        """Flush queued frames and release the underlying writer"""
+        self.queue.put(None)
+        self.join(timeout=5)
+        self.writer.release()
+
+class FrameGrabber(threading.Thread):
+    """Background thread that keeps the most recent stream frame available.
+
+    Reading the MJPEG stream blocks on network I/O; doing it on its own
+    thread overlaps that wait with frame processing in the main loop.
+    Only the latest frame is kept, so the consumer never falls behind.
+    """
+
+    def __init__(self, cap, url):
+        super().__init__(daemon=True)
+        self.cap = cap
+        self.url = url
+        self.latest = None
+        self.lock = threading.Lock()
+        self.running = True
+
+    def run(self):
+        while self.running:
+            ret, frame = self.cap.read()
+
+            if not ret:
+                print("Error: Could not read frame. Attempting to reconnect...")
+                time.sleep(1)
+                self.cap.release()
+                self.cap = cv2.VideoCapture(self.url)
+                continue
+
+            with self.lock:
+                self.latest = frame
+
+    def read(self):
+        """Return a copy of the most recent frame, or None if none arrived yet.
+
+        Only the reference grab happens under the lock; the frame copy
+        runs after release (numpy drops the GIL for the memcpy), so the
+        grabber is never blocked for the duration of a full-frame copy.
+        The grabbed reference is safe to copy outside the lock because
+        cap.read() produces a fresh buffer each iteration and the old
+        one is never written again.
+        """
+        with self.lock:
+            latest = self.latest
+        return latest.copy() if latest is not None else None
+
+    def stop(self):
+        """Stop the thread and release the capture"""
+        self.running = False
+        self.join(timeout=2)
+        self.cap.release()
+
 def process_frame(frame, mode='default'):
     """
     Process the frame with OpenCV.
@@ -31,60 +235,76 @@ def process_frame(frame, mode='default'):
         mode: Processing mode (default, edges, gray, threshold, contours)
         
     Returns:
-        processed_frame: The processed frame
+        processed_frame: The processed frame. The edges, gray and
+        threshold modes return a single-channel image; imshow displays
+        it directly and the save path converts to BGR only when needed.
     """
+    global _contour_buf, _combined_buf, _thresh_buf
+
     if mode == 'edges':
-        # Convert to grayscale and detect edges
-        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-        blurred = cv2.GaussianBlur(gray, (5, 5), 0)
-        edges = cv2.Canny(blurred, 50, 150)
-        return cv2.cvtColor(edges, cv2.COLOR_GRAY2BGR)
-    
+        # Convert to blurred grayscale and detect edges
+        blurred = blurred_gray(frame)
+        return cv2.Canny(blurred, 50, 150)
+
     elif mode == 'gray':
         # Simple grayscale conversion
-        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-        return cv2.cvtColor(gray, cv2.COLOR_GRAY2BGR)
-    
+        return cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+
     elif mode == 'threshold':
         # Apply adaptive thresholding
         gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+
+        if HAS_NUMBA:
+            # Single fused sliding-window pass into a reusable buffer
+            if _thresh_buf is None or _thresh_buf.shape != gray.shape:
+                _thresh_buf = np.empty_like(gray)
+            _adaptive_threshold_numba(gray, _thresh_buf, 11, 2.0)
+            return _thresh_buf
+
         blurred = cv2.GaussianBlur(gray, (5, 5), 0)
-        thresh = cv2.adaptiveThreshold(blurred, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C,
-                                      cv2.THRESH_BINARY, 11, 2)
-        return cv2.cvtColor(thresh, cv2.COLOR_GRAY2BGR)
+        return cv2.adaptiveThreshold(blurred, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C,
+                                     cv2.THRESH_BINARY, 11, 2)
     
     elif mode == 'contours':
         # Find and draw contours
-        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-        blurred = cv2.GaussianBlur(gray, (5, 5), 0)
+        blurred = blurred_gray(frame)
         edges = cv2.Canny(blurred, 50, 150)
-        
+
         # Find contours
         contours, _ = cv2.findContours(edges, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-        
-        # Draw contours
-        contour_img = np.zeros_like(frame)
-        cv2.drawContours(contour_img, contours, -1, (0, 255, 0), 2)
-        return contour_img
-    
+
+        # Draw contours on the reusable black canvas (fill(0) is a
+        # memset into already-mapped pages, cheaper than zeros_like)
+        if _contour_buf is None or _contour_buf.shape != frame.shape:
+            _contour_buf = np.empty_like(frame)
+        _contour_buf.fill(0)
+        cv2.drawContours(_contour_buf, contours, -1, (0, 255, 0), 2)
+        return _contour_buf
+
     elif mode == 'combined':
         # Show original, edges, and contours side-by-side
-        original = frame.copy()
-        
+        h, w = frame.shape[:2]
+
         # Create edges
-        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-        blurred = cv2.GaussianBlur(gray, (5, 5), 0)
+        blurred = blurred_gray(frame)
         edges = cv2.Canny(blurred, 50, 150)
         edges_colored = cv2.cvtColor(edges, cv2.COLOR_GRAY2BGR)
-        
-        # Create contours
+
+        # Create contours on the reusable black canvas
         contours, _ = cv2.findContours(edges, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-        contour_img = np.zeros_like(frame)
-        cv2.drawContours(contour_img, contours, -1, (0, 255, 0), 2)
-        
-        # Combine images horizontally
-        result = np.hstack((original, edges_colored, contour_img))
-        return result
+        if _contour_buf is None or _contour_buf.shape != frame.shape:
+            _contour_buf = np.empty_like(frame)
+        _contour_buf.fill(0)
+        cv2.drawContours(_contour_buf, contours, -1, (0, 255, 0), 2)
+
+        # Combine images horizontally into the reusable wide buffer
+        # (slice copies instead of np.hstack's fresh allocation)
+        if _combined_buf is None or _combined_buf.shape != (h, 3 * w, 3):
+            _combined_buf = np.empty((h, 3 * w, 3), np.uint8)
+        np.copyto(_combined_buf[:, :w], frame)
+        np.copyto(_combined_buf[:, w:2 * w], edges_colored)
+        np.copyto(_combined_buf[:, 2 * w:], _contour_buf)
+        return _combined_buf
     
     else:  # default mode
         # Return original frame
@@ -95,7 +315,14 @@ def main():
     
     # Register signal handler for Ctrl+C
     signal.signal(signal.SIGINT, signal_handler)
-    
+
+    # Use OpenCV's optimized (SIMD) code paths and its internal thread
+    # pool so per-frame filters run across all cores
+    cv2.setUseOptimized(True)
+    cv2.setNumThreads(max(2, os.cpu_count() or 1))
+    if cv2.ocl.haveOpenCL():
+        cv2.ocl.setUseOpenCL(True)
+
     # Create argument parser
     parser = argparse.ArgumentParser(description='Access ESP32-CAM stream with OpenCV')
     parser.add_argument('--ip', type=str, default='192.168.4.1', 
@@ -113,7 +340,9 @@ def main():
                         help='Output video filename (default: esp32_output.mp4)')
     parser.add_argument('--resize', type=int, default=0,
                         help='Resize output window to this width (keeps aspect ratio, 0 for no resize)')
-    
+    parser.add_argument('--headless', action='store_true',
+                        help='Run without any GUI windows (useful with --save; exit with Ctrl+C)')
+
     args = parser.parse_args()
     
     # Construct the URL for the stream
@@ -135,9 +364,6 @@ def main():
     # Video writer for saving
     out = None
     if args.save:
-        # Define the codec and create VideoWriter object
-        fourcc = cv2.VideoWriter_fourcc(*'mp4v')
-        
         # Adjust output size based on processing mode
         if args.mode == 'combined':
             out_width = frame_width * 3  # Three images side by side
@@ -145,82 +371,114 @@ def main():
         else:
             out_width = frame_width
             out_height = frame_height
-            
-        out = cv2.VideoWriter(args.output, fourcc, 10.0, (out_width, out_height))
+
+        # Encode on a background thread so write() never blocks the loop
+        out = AsyncVideoWriter(create_video_writer(args.output, 10.0, (out_width, out_height)))
         print(f"Saving output to: {args.output}")
     
-    # Create window with adjustable size
+    # Create window with adjustable size (skipped entirely in headless
+    # mode, which also avoids the per-frame GUI event round-trips)
     window_name = f'ESP32-CAM Stream ({args.mode} mode)'
-    cv2.namedWindow(window_name, cv2.WINDOW_NORMAL)
-    
-    # Set window size if requested
-    if args.resize > 0:
-        # Calculate height to maintain aspect ratio
-        if args.mode == 'combined':
-            aspect_ratio = (frame_width * 3) / frame_height
+    if not args.headless:
+        cv2.namedWindow(window_name, cv2.WINDOW_NORMAL)
+
+        # Set window size if requested
+        if args.resize > 0:
+            # Calculate height to maintain aspect ratio
+            if args.mode == 'combined':
+                aspect_ratio = (frame_width * 3) / frame_height
+            else:
+                aspect_ratio = frame_width / frame_height
+
+            resize_height = int(args.resize / aspect_ratio)
+            cv2.resizeWindow(window_name, args.resize, resize_height)
+        elif args.mode == 'combined':
+            # Default size for combined mode
+            cv2.resizeWindow(window_name, 1280, int(1280 * frame_height / (frame_width * 3)))
         else:
-            aspect_ratio = frame_width / frame_height
-        
-        resize_height = int(args.resize / aspect_ratio)
-        cv2.resizeWindow(window_name, args.resize, resize_height)
-    elif args.mode == 'combined':
-        # Default size for combined mode
-        cv2.resizeWindow(window_name, 1280, int(1280 * frame_height / (frame_width * 3)))
+            # Default size for other modes
+            cv2.resizeWindow(window_name, 640, int(640 * frame_height / frame_width))
+
+    if args.headless:
+        print("Stream started (headless). Press Ctrl+C to exit.")
     else:
-        # Default size for other modes
-        cv2.resizeWindow(window_name, 640, int(640 * frame_height / frame_width))
-    
-    print("Stream started. Press 'q' to exit.")
-    
+        print("Stream started. Press 'q' to exit.")
+
+    # Read the stream on a separate thread so network I/O overlaps
+    # with processing and display
+    grabber = FrameGrabber(cap, url)
+    grabber.start()
+
     try:
-        # Track FPS
-        fps_start_time = time.time()
+        # Track FPS (timer sampled only every 10 frames; the overlay
+        # string is cached so it is not re-formatted per frame)
+        fps_start_time = time.perf_counter()
         fps_frame_count = 0
-        fps = 0
-        
+        fps_text = "FPS: 0.0"
+
+        # Reused for converting single-channel frames to BGR when saving
+        bgr_scratch = None
+
+        frame_idx = 0
+
         while True:
-            # Read frame from the video stream
-            ret, frame = cap.read()
-            
-            if not ret:
-                print("Error: Could not read frame. Attempting to reconnect...")
-                # Wait a bit before trying to reconnect
-                time.sleep(1)
-                cap.release()
-                cap = cv2.VideoCapture(url)
+            # Grab the most recent frame from the reader thread
+            frame = grabber.read()
+
+            if frame is None:
+                # No frame yet; wait briefly for the grabber
+                time.sleep(0.005)
                 continue
-            
+
             # Process the frame
             processed_frame = process_frame(frame, args.mode)
             
             # Calculate FPS
             fps_frame_count += 1
             if fps_frame_count >= 10:
-                end_time = time.time()
-                fps = fps_frame_count / (end_time - fps_start_time)
-                fps_start_time = time.time()
+                now = time.perf_counter()
+                fps_text = f"FPS: {fps_frame_count / (now - fps_start_time):.1f}"
+                fps_start_time = now
                 fps_frame_count = 0
-            
-            # Add FPS text to frame
-            cv2.putText(processed_frame, f"FPS: {fps:.1f}", (10, 30),
-                        cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2)
-            
-            # Save frame if requested
+
+            # Add FPS text to frame (white on single-channel images)
+            fps_color = 255 if processed_frame.ndim == 2 else (0, 255, 0)
+            cv2.putText(processed_frame, fps_text, (10, 30),
+                        cv2.FONT_HERSHEY_SIMPLEX, 1, fps_color, 2)
+
+            # Save frame if requested (the writer needs BGR, so convert
+            # single-channel frames into a reusable scratch buffer)
             if args.save and out is not None:
-                out.write(processed_frame)
+                if processed_frame.ndim == 2:
+                    if bgr_scratch is None or bgr_scratch.shape[:2] != processed_frame.shape:
+                        bgr_scratch = np.empty(processed_frame.shape + (3,), np.uint8)
+                    cv2.cvtColor(processed_frame, cv2.COLOR_GRAY2BGR, dst=bgr_scratch)
+                    out.write(bgr_scratch)
+                else:
+                    out.write(processed_frame)
             
+            frame_idx += 1
+
+            if args.headless:
+                continue
+
             # Display the frame
             cv2.imshow(window_name, processed_frame)
-            
-            # Press 'q' to exit
-            if cv2.waitKey(1) & 0xFF == ord('q'):
+
+            # Press 'q' to exit. A full waitKey(1) sleeps ~1 ms, so it
+            # only runs every 3rd frame; pollKey returns immediately
+            if (frame_idx % 3) == 0 or not hasattr(cv2, 'pollKey'):
+                key = cv2.waitKey(1) & 0xFF
+            else:
+                key = cv2.pollKey() & 0xFF
+            if key == ord('q'):
                 break
     
     except Exception as e:
         print(f"Error: {e}")
     finally:
         # Release the VideoCapture and close windows
-        cap.release()
+        grabber.stop()
         if out is not None:
             out.release()
         cv2.destroyAllWindows()